@@ -1,29 +1,69 @@
-from urllib.parse import urlparse
+from urllib.parse import urlsplit
+from functools import lru_cache
+import re
 import os.path
 from argparse import ArgumentParser, ArgumentTypeError
 
 
+_INVALID_URL_MESSAGE = 'Argument "{}" must be a valid URL.'
+_NOT_INTEGER_MESSAGE = 'Argument "{}" must be an integer.'
+_NOT_POSITIVE_MESSAGE = 'Argument "{}" must be greater than 0.'
+
+_ALLOWED_SCHEMES = frozenset(("http", "https"))
+_NETLOC_RE = re.compile(r"[^/?#]*")
+# urlsplit drops leading C0 control characters and spaces,
+# and removes tabs and line breaks anywhere in the URL
+_LEADING_URL_JUNK = "".join(map(chr, range(0x21)))
+_UNSAFE_URL_CHARS = str.maketrans("", "", "\t\r\n")
+# plain ASCII host without brackets, the common case of _validate_host
+_HOST_PATTERN = r"[Hh][Tt][Tt][Pp][Ss]?://[^/?#\[\]\t\r\n\x80-\U0010ffff]+(?:[/?#][^\n]*)?"
+_HOSTS_RE = re.compile(rf"{_HOST_PATTERN}(?:\n{_HOST_PATTERN})*")
+# large read buffer for host files with many lines
+_READ_BUFFER_SIZE = 1 << 20
+
+
+@lru_cache(maxsize=32)
 def check_count(value) -> int:
     """Checks for the non-negative integer. Raises ArgumentTypeError if not."""
-    try:
+    if isinstance(value, str) and value.isascii() and value.isdigit():
+        # plain decimal string, int() can't fail here
         int_value = int(value)
-    except ValueError as e:
-        raise ArgumentTypeError(f'Argument "{value}" must be an integer.') from e
+    else:
+        try:
+            int_value = int(value)
+        except ValueError as e:
+            raise ArgumentTypeError(_NOT_INTEGER_MESSAGE.format(value)) from e
     if int_value < 1:
-        raise ArgumentTypeError(f'Argument "{value}" must be greater than 0.')
+        raise ArgumentTypeError(_NOT_POSITIVE_MESSAGE.format(value))
     return int_value
 
 
+def _validate_host(host: str) -> None:
+    """Checks one host for validity. Raises ArgumentTypeError if host is invalid."""
+    url = host.lstrip(_LEADING_URL_JUNK).translate(_UNSAFE_URL_CHARS)
+    scheme, separator, rest = url.partition("://")
+    if not separator or scheme.lower() not in _ALLOWED_SCHEMES:
+        raise ArgumentTypeError(_INVALID_URL_MESSAGE.format(host))
+    netloc = _NETLOC_RE.match(rest).group()
+    if not netloc:
+        raise ArgumentTypeError(_INVALID_URL_MESSAGE.format(host))
+    if "[" in netloc or "]" in netloc or not netloc.isascii():
+        # IPv6 literals and non-ASCII hosts are rare, leave them to urlsplit
+        try:
+            urlsplit(host)
+        except ValueError as e:
+            raise ArgumentTypeError(_INVALID_URL_MESSAGE.format(host)) from e
+
+
 def validate_hosts(hosts: list[str]) -> None:
     """Checks hosts for validity.
     Raises ArgumentTypeError if host is invalid."""
+    # fast path: match all hosts at once if none of them contains a line break
+    buffer = "\n".join(hosts)
+    if buffer.count("\n") == len(hosts) - 1 and _HOSTS_RE.fullmatch(buffer):
+        return
     for host in hosts:
-        try:
-            parsed_host = urlparse(host)
-        except ValueError as e:
-            raise ArgumentTypeError(f'Argument "{host}" must be a valid URL.') from e
-        if parsed_host.scheme not in ['http', 'https'] or not parsed_host.netloc:
-            raise ArgumentTypeError(f'Argument "{host}" must be a valid URL.')
+        _validate_host(host)
 
 
 def convert_hosts(hosts: str) -> list[str]:
@@ -37,8 +77,8 @@ def convert_hosts(hosts: str) -> list[str]:
 
 def convert_input_file(path: str) -> list[str]:
     """Converts the input file to a list. Raises ArgumentTypeError if any host is invalid."""
-    with open(path, "r", encoding = "utf-8") as file:
-        hosts = [line.strip() for line in file.readlines() if line.strip()]
+    with open(path, "r", buffering = _READ_BUFFER_SIZE, encoding = "utf-8") as file:
+        hosts = [host for host in (line.strip() for line in file) if host]
     validate_hosts(hosts)
     return hosts
 
@@ -4,8 +4,9 @@ File for checking the availability of multiple sites.
 Run python ./bench.py -h for help.
 """
 from argparse import ArgumentTypeError
-import time
-import enum
+import sys
+from time import perf_counter
+from typing import TextIO
 from dataclasses import dataclass
 
 import asyncio
@@ -14,28 +15,19 @@ import aiohttp
 from args_parser import ArgsParser
 
 
-class ResultStatus(enum.Enum):
-    """
-    Enum-class for request status.
-
-    OK - request ended with 2xx code.
-    Failed - request ended with 4xx or 5xx codes.
-    Error - request ended with an error (e.g. connection error).
-    """
-    OK = "ok"
-    FAILED = "failed"
-    ERROR = "error"
+# Upper bound of requests in flight across all hosts.
+MAX_CONCURRENT_REQUESTS = 512
 
 
-@dataclass
-class FetchResult:
-    """
-    Class for storing fetch results.
+# Request statuses.
+# OK - request ended with 2xx code.
+# FAILED - request ended with 4xx or 5xx codes.
+# ERROR - request ended with an error (e.g. connection error).
+OK, FAILED, ERROR = 0, 1, 2
 
-    time - time taken for the request in seconds. float('-inf') if request errored.
-    """
-    status: ResultStatus
-    time: float
+# Fetch result: (status, time taken for the request in seconds).
+# Time is float('-inf') if request errored.
+FetchResult = tuple[int, float]
 
 
 async def fetch_once(session: aiohttp.ClientSession, host: str) -> FetchResult:
@@ -47,14 +39,13 @@ async def fetch_once(session: aiohttp.ClientSession, host: str) -> FetchResult:
     :return: FetchResult with status and request's time
     """
     try:
-        start = time.perf_counter()
+        start = perf_counter()
         async with session.get(host) as response:
-            seconds = round(time.perf_counter() - start, 3)
-            if response.ok:
-                return FetchResult(ResultStatus.OK, seconds)
-            return FetchResult(ResultStatus.FAILED, seconds)
+            seconds = perf_counter() - start
+            # same as response.ok without the property call
+            return (OK if response.status < 400 else FAILED), seconds
     except aiohttp.ClientError:
-        return FetchResult(ResultStatus.ERROR, float("-inf"))
+        return ERROR, float("-inf")
 
 
 @dataclass
@@ -66,16 +57,16 @@ class HostInfo:
     :param success: Number of successful requests
     :param failed: Number of failed requests (4xx or 5xx)
     :param errors: Number of errors
-    :param min: Minimum response time. float('inf') if only error requests were made
-    :param max: Maximum response time. float('-inf') if only error requests were made
+    :param min: Minimum response time. None if only error requests were made
+    :param max: Maximum response time. None if only error requests were made
     :param avg: Average response time. None if only error requests were made
     """
     host: str
     success: int = 0
     failed: int = 0
     errors: int = 0
-    min: float = float("inf")
-    max: float = float("-inf")
+    min: float | None = None
+    max: float | None = None
     avg: float | None = None
 
     def items(self):
@@ -107,6 +98,7 @@ class SitesChecker:
         self.output_file = output_file
         self.count = count
         self.results: list[HostInfo] = []
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
 
     async def fetch_host(self, session: aiohttp.ClientSession, host: str) -> HostInfo:
         """
@@ -116,61 +108,99 @@ class SitesChecker:
         :param host: URL
         :return: Information dict with host status
         """
-        tasks = [fetch_once(session, host) for _ in range(self.count)]
-        results: list[FetchResult] = await asyncio.gather(*tasks)
         info = HostInfo(host = host)
-        for result in results:
-            if result.status == ResultStatus.ERROR:
+        min_time, max_time, total_time = float("inf"), float("-inf"), 0.0
+        running: set[asyncio.Task] = set()
+        failure: BaseException | None = None
+        semaphore = self._semaphore
+
+        def retire(task: asyncio.Task) -> None:
+            """Free the request's slot and add its result to the host info."""
+            nonlocal min_time, max_time, total_time, failure
+            running.discard(task)
+            semaphore.release()
+            if task.cancelled():
+                return
+            if task.exception() is not None:
+                failure = failure or task.exception()
+                return
+            status, seconds = task.result()
+            if status == ERROR:
                 info.errors += 1
-                continue
-            info.min = min(info.min, result.time)
-            info.max = max(info.max, result.time)
-            if info.avg is None:
-                info.avg = 0.0
-            info.avg = round(
-                (info.success * info.avg + result.time) / (info.success + 1),
-                3
-            )
-            if result.status == ResultStatus.OK:
+                return
+            if seconds < min_time:
+                min_time = seconds
+            if seconds > max_time:
+                max_time = seconds
+            total_time += seconds
+            if status == OK:
                 info.success += 1
             else:
                 info.failed += 1
+
+        try:
+            # a task is created only after its slot is taken, so at most
+            # MAX_CONCURRENT_REQUESTS request tasks are alive across all hosts
+            for _ in range(self.count):
+                await semaphore.acquire()
+                task = asyncio.create_task(fetch_once(session, host))
+                running.add(task)
+                task.add_done_callback(retire)
+            if running:
+                await asyncio.wait(running)
+        finally:
+            for task in running:
+                task.cancel()
+        if failure is not None:
+            raise failure
+        if info.success or info.failed:
+            info.min, info.max = round(min_time, 3), round(max_time, 3)
+            info.avg = round(total_time / (info.success + info.failed), 3)
         return info
 
     async def start(self) -> None:
         """Start the sites checker."""
-        async with aiohttp.ClientSession() as session:
+        # a semaphore that had to wait is bound to its event loop, so every run gets its own
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        # no connector limits: a request queued for a connection would count
+        # the waiting as response time, concurrency is bounded by the semaphore
+        connector = aiohttp.TCPConnector(
+            limit = 0,
+            keepalive_timeout = 30,
+            ttl_dns_cache = 300,
+        )
+        async with aiohttp.ClientSession(connector = connector) as session:
             tasks = [self.fetch_host(session, host) for host in self.hosts]
             self.results = await asyncio.gather(*tasks)
 
-    def print_table(self):
-        """Prints the table of results. If there are no hosts, does nothing."""
+    def print_table(self, *, stream: TextIO | None = None) -> None:
+        """
+        Prints the table of results. If there are no hosts, does nothing.
+
+        :param stream: Text stream to write the table to.
+        If None, the table is written to the output file or to stdout.
+        """
         if not self.results:
             return
         keys = ("host", "success", "failed", "errors", "min", "max", "avg")
-        max_lens = {key: len(key) + 2 for key in keys}
-        for info_host in self.results:
-            for key, value in info_host.items():
-                if value is None:
-                    value = ""
-                max_lens[key] = max(len(str(value)) + 2, max_lens[key])
-        # dicts are ordered from Python 3.7
-        border = "+" + "+".join("-" * (value + 2) for key, value in max_lens.items()) + "+"
-        header = "|" + "|".join(f" {key.title().center(value)} "
-                                for key, value in max_lens.items()) + "|"
-        lines = [border, header, border]
-        for info_host in self.results:
-            line = "|"
-            for key, value in info_host.items():
-                if value is None or value in (float("inf"), float("-inf")):
-                    value = ""
-                line += f" {str(value).center(max_lens[key])} |"
-            lines.extend([line, border])
-        if self.output_file:
+        rows = [["" if (value := info_host[key]) is None else str(value) for key in keys]
+                for info_host in self.results]
+        # zip(*rows) gives the columns, each must fit its header and the longest cell
+        max_lens = [max(len(key), *map(len, column)) + 2
+                    for key, column in zip(keys, zip(*rows))]
+        border = "+" + "+".join("-" * (width + 2) for width in max_lens) + "+"
+        lines = [border]
+        for row in [list(map(str.title, keys)), *rows]:
+            cells = (value.center(width) for value, width in zip(row, max_lens))
+            lines.extend(["| " + " | ".join(cells) + " |", border])
+        table = "\n".join(lines) + "\n"
+        if stream is not None:
+            stream.write(table)
+        elif self.output_file:
             with open(self.output_file, "w", encoding="utf-8") as file:
-                print(*lines, sep="\n", file=file)
+                file.write(table)
         else:
-            print(*lines, sep="\n")
+            sys.stdout.write(table)
 
 
 async def main() -> None:
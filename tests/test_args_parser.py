@@ -1,31 +1,66 @@
 """Tests for ArgsParser."""
 import unittest
 import io
-import shutil
+import sys
 import tempfile
 import pathlib
+import random
 from unittest.mock import patch
+from urllib.parse import urlparse
 
 from argparse import ArgumentTypeError
 
 from args_parser import ArgsParser, validate_hosts, check_count, convert_input_file
 
 
+INCORRECT_HOSTS = (
+    "https://[][][][][]",
+    "test",
+    "2025",
+    "https:/202520252025.com",
+    "http",
+    "",
+)
+INCORRECT_COUNTS = ("0", "-1", "abc", "1.1", "0,0", "-1.1", "*", "")
+# valid hosts besides plain lowercase URLs, most of them left to the per-host check
+SLOW_PATH_HOSTS = (
+    "HTTPS://Example.com",
+    "https://[::1]/",
+    "http://[2001:db8::1]:8080/path",
+    "http://пример.рф/",
+    "http:/\t/example.com",
+    "https://exa\rmple.com/",
+    " https://example.com",
+    "https://example.com/\npath",
+)
+# invalid hosts whose netloc is empty after urlsplit's cleanup or is a broken IPv6 literal
+INCORRECT_SLOW_PATH_HOSTS = ("http://\t/", "https://\r\n", "https://[::1/")
+
+
+def urlparse_accepts(host: str) -> bool:
+    """Reference check: the urlparse-based validation validate_hosts must agree with."""
+    try:
+        parsed = urlparse(host)
+    except ValueError:
+        return False
+    return parsed.scheme in ("http", "https") and bool(parsed.netloc)
+
+
 class ArgsParserTestCase(unittest.TestCase):
     """Tests for ArgsParser."""
-    def setUp(self):
-        """Set up test environment. Create necessary temporary files and directories."""
-        self.parser = ArgsParser()
-        self.temp_path = pathlib.Path(tempfile.mkdtemp())
-        self.correct_hosts_file = pathlib.Path(self.temp_path / "hosts.txt")
-        self.output_file = pathlib.Path(self.temp_path / "output.txt")
-        self.correct_hosts = "https://yandex.ru,https://google.com,https://example.com/"
-        self.correct_hosts_file.write_text(self.correct_hosts.replace(",", "\n"),
-                                           encoding="utf-8")
-
-    def tearDown(self):
-        """Tear down test environment. Remove temporary files and directories."""
-        shutil.rmtree(self.temp_path)
+    @classmethod
+    def setUpClass(cls):
+        """Set up test environment once for the class.
+        Create the parser and necessary temporary files and directories. Tests only read them."""
+        cls.parser = ArgsParser()
+        temp_dir = tempfile.TemporaryDirectory(prefix = f"{cls.__name__}_")
+        cls.addClassCleanup(temp_dir.cleanup)
+        cls.temp_path = pathlib.Path(temp_dir.name)
+        cls.correct_hosts_file = pathlib.Path(cls.temp_path / "hosts.txt")
+        cls.output_file = pathlib.Path(cls.temp_path / "output.txt")
+        cls.correct_hosts = "https://yandex.ru,https://google.com,https://example.com/"
+        cls.correct_hosts_file.write_text(cls.correct_hosts.replace(",", "\n"),
+                                          encoding="utf-8")
 
     def test_just_works(self):
         """Just works test."""
@@ -46,39 +81,71 @@ class ArgsParserTestCase(unittest.TestCase):
         """Test different names of arguments:
         -H --hosts, -C --count, -F --file, -O --output
         """
-        a = self.parser.parse_args(["-H", self.correct_hosts])
-        b = self.parser.parse_args(["--hosts", self.correct_hosts])
-        self.assertEqual(a.hosts, b.hosts)
-        a = self.parser.parse_args(["-H", self.correct_hosts, "-C", "52"])
-        b = self.parser.parse_args(["-H", self.correct_hosts, "--count", "52"])
-        self.assertEqual(a.count, b.count)
-        a = self.parser.parse_args(["-F", str(self.correct_hosts_file)])
-        b = self.parser.parse_args(["--file", str(self.correct_hosts_file)])
-        self.assertEqual(a.hosts, b.hosts)
-        a = self.parser.parse_args(["-H", self.correct_hosts, "-O", str(self.output_file)])
-        b = self.parser.parse_args(["-H", self.correct_hosts, "--output", str(self.output_file)])
-        self.assertEqual(a.output, b.output)
+        hosts_file, output_file = str(self.correct_hosts_file), str(self.output_file)
+        cases = {
+            "short": ["-H", self.correct_hosts, "-C", "52", "-O", output_file],
+            "long": ["--hosts", self.correct_hosts, "--count", "52", "--output", output_file],
+            "file_short": ["-F", hosts_file],
+            "file_long": ["--file", hosts_file],
+        }
+        namespaces = {name: self.parser.parse_args(args) for name, args in cases.items()}
+        self.assertEqual(namespaces["short"], namespaces["long"])
+        self.assertEqual(namespaces["file_short"], namespaces["file_long"])
+        self.assertEqual(namespaces["short"].count, 52)
+        self.assertEqual(namespaces["short"].output, output_file)
+        self.assertEqual(namespaces["file_short"].hosts, namespaces["short"].hosts)
 
     def test_incorrect_hosts(self):
         """Test with incorrect hosts."""
-        incorrect_hosts = [
-            "https://[][][][][]",
-            "test",
-            "2025",
-            "https:/202520252025.com",
-            "http",
-            ""
-        ]
-        for host in incorrect_hosts:
-            self.assertRaises(ArgumentTypeError, validate_hosts, [host])
+        for host in INCORRECT_HOSTS:
+            with self.subTest(host = host):
+                self.assertRaises(ArgumentTypeError, validate_hosts, [host])
+
+    def test_slow_path_hosts(self):
+        """Test valid hosts that aren't matched by the fast path, alone and among others."""
+        for host in SLOW_PATH_HOSTS:
+            with self.subTest(host = host):
+                validate_hosts([host])
+                validate_hosts(["https://example.com", host, "http://example.org"])
+        validate_hosts(list(SLOW_PATH_HOSTS))
+        # no raises
+
+    def test_incorrect_slow_path_hosts(self):
+        """Test invalid hosts that look valid before urlsplit's checks."""
+        for host in INCORRECT_SLOW_PATH_HOSTS:
+            with self.subTest(host = host):
+                self.assertRaises(ArgumentTypeError, validate_hosts, [host])
+
+    def test_one_incorrect_host_among_correct(self):
+        """Test that one incorrect host fails the whole list."""
+        hosts = self.correct_hosts.split(",")
+        for host in INCORRECT_HOSTS + INCORRECT_SLOW_PATH_HOSTS:
+            with self.subTest(host = host):
+                self.assertRaises(ArgumentTypeError, validate_hosts, [*hosts, host, *hosts])
+
+    def test_hosts_match_urlparse(self):
+        """Test that both validation paths agree with urlparse on random hosts."""
+        rng = random.Random(2025)
+        prefixes = ("http://", "https://", "HTTP://", "http:/", "http:", "", " http://", "ht\ttp://")
+        alphabet = "htps:/?#[]\t\r\n a.é\x011"
+        for _ in range(3000):
+            host = rng.choice(prefixes) + "".join(rng.choices(alphabet, k = rng.randint(0, 6)))
+            with self.subTest(host = host):
+                for hosts in ([host], ["https://example.com", host]):
+                    try:
+                        validate_hosts(hosts)
+                        accepted = True
+                    except ArgumentTypeError:
+                        accepted = False
+                    self.assertEqual(accepted, urlparse_accepts(host))
 
     def test_incorrect_count(self):
         """Test with incorrect count values. (values must be positive integers)"""
-        incorrect_count = ["0", "-1", "abc", "1.1", "0,0", "-1.1", "*", ""]
-        for count in incorrect_count:
-            self.assertRaises(ArgumentTypeError, check_count, count)
+        for count in INCORRECT_COUNTS:
+            with self.subTest(count = count):
+                self.assertRaises(ArgumentTypeError, check_count, count)
 
-    @patch("sys.stderr", new_callable=io.StringIO)
+    @patch.object(sys, "stderr", new_callable=io.StringIO)
     def test_two_inputs(self, _):
         """Test with two input sources. There's must be exception."""
         with self.assertRaises(SystemExit) as error:
@@ -1,172 +1,283 @@
 """Tests of argument parser and bench.py."""
 import asyncio
+import functools
 import io
-import shutil
+import sys
 import tempfile
 import unittest
 import pathlib
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch
 
 import aiohttp
 
+import bench
 from bench import SitesChecker, main
 
 
+class FakeResponse:
+    """Lightweight stand-in for aiohttp.ClientResponse."""
+    def __init__(self, status: int) -> None:
+        self.status = status
+        self.ok = status < 400
+
+
+class FakeRequestContext:
+    """Lightweight stand-in for the context manager returned by ClientSession.get."""
+    def __init__(self,
+                 response: FakeResponse,
+                 delay: int | float = 0,
+                 raises: type[Exception] | None = None) -> None:
+        self.response = response
+        self.delay = delay
+        self.raises = raises
+
+    async def __aenter__(self) -> FakeResponse:
+        """Wait for the delay, then raise the exception or return the response."""
+        if self.delay > 0:
+            await asyncio.sleep(self.delay)
+        if self.raises is not None:
+            raise self.raises
+        return self.response
+
+    async def __aexit__(self, *args) -> bool:
+        """Don't suppress exceptions."""
+        return False
+
+
+class InFlightRequestContext(FakeRequestContext):
+    """FakeRequestContext counting how many requests are inside it at once."""
+    def __init__(self, response: FakeResponse) -> None:
+        super().__init__(response)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __aenter__(self) -> FakeResponse:
+        """Count the request, then give control to other requests instead of waiting."""
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0)
+        return await super().__aenter__()
+
+    async def __aexit__(self, *args) -> bool:
+        """Uncount the request."""
+        self.in_flight -= 1
+        return await super().__aexit__(*args)
+
+
+class FakeClock:
+    """Fake perf_counter, moved forward only by TimedRequestContext."""
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Return the current fake time."""
+        return self.now
+
+
+class TimedRequestContext(FakeRequestContext):
+    """FakeRequestContext taking the given duration on a fake clock."""
+    def __init__(self, response: FakeResponse, clock: FakeClock, duration: float) -> None:
+        super().__init__(response)
+        self.clock = clock
+        self.duration = duration
+
+    async def __aenter__(self) -> FakeResponse:
+        """Move the clock forward by the duration without yielding control."""
+        self.clock.now += self.duration
+        return await super().__aenter__()
+
+
+@functools.cache
+def create_mock_get(status: int,
+                    delay: int | float = 0,
+                    raises: type[Exception] | None = None) -> FakeRequestContext:
+    """
+    Create a mock GET request. Mocks are cached by arguments and shared between tests.
+
+    :param status: HTTP-status code
+    :param delay: Delay of the request's processing (in seconds)
+    :param raises: Exception to raise while requesting (if any)
+
+    :return: Context manager returning the fake ClientResponse
+    """
+    return FakeRequestContext(FakeResponse(status), delay, raises)
+
+
 class BenchTestCase(unittest.IsolatedAsyncioTestCase):
     """Tests for site_checker."""
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Patch ClientSession.get once for the whole class."""
+        super().setUpClass()
+        patcher = patch.object(aiohttp.ClientSession, "get")
+        cls.mock_get = patcher.start()
+        cls.addClassCleanup(patcher.stop)
+
     def setUp(self) -> None:
-        """Set up test environment. Create necessary temporary files and directories."""
-        self.temp_dir = pathlib.Path(tempfile.mkdtemp())
-        self.output_file = self.temp_dir / "output.txt"
-
-    def tearDown(self) -> None:
-        """Tear down test environment. Remove temporary files and directories."""
-        shutil.rmtree(self.temp_dir)
-
-    @staticmethod
-    def create_mock_get(status: int,
-                        delay: int | float = 0,
-                        raises: type[Exception] | None = None) -> AsyncMock:
-        """
-        Create a mock GET request.
-        
-        :param status: HTTP-status code
-        :param delay: Delay of the request's processing (in seconds)
-        :param raises: Exception to raise while requesting (if any)
-
-        :return: Mocked ClientResponse
-        """
-        mock_response = AsyncMock(spec=aiohttp.ClientResponse)
-        mock_response.status = status
-        mock_response.ok = status < 400
-        async def delay_and_raise():
-            if delay > 0:
-                await asyncio.sleep(delay)
-            if raises is not None:
-                raise raises
-            return mock_response
-        mock_acm = AsyncMock()
-        mock_acm.__aenter__.side_effect = delay_and_raise
-        return mock_acm
-
-    @patch("aiohttp.ClientSession.get")
-    async def test_just_works(self, mock_get):
-        """Test successful GET request."""
-        mock_get.return_value = self.__class__.create_mock_get(200)
-        hosts = ["https://example.com"]
-        sites_checker = SitesChecker(hosts = hosts, count = 1)
-        await sites_checker.start()
-        info = sites_checker.results[0]
-        self.assertEqual(info["host"], hosts[0])
-        self.assertEqual(info["success"], 1)
-        self.assertEqual(info["errors"], 0)
-        self.assertEqual(info["failed"], 0)
+        """Set up test environment. Reset the shared mock."""
+        self.mock_get.reset_mock(return_value = True, side_effect = True)
 
-    @patch("aiohttp.ClientSession.get")
-    async def test_server_error(self, mock_get):
+    async def test_server_error(self):
         """Test server error responses."""
-        for e in (aiohttp.ClientError, aiohttp.ServerTimeoutError, aiohttp.ServerDisconnectedError):
-            mock_get.return_value = self.__class__.create_mock_get(500, raises = e)
-            hosts = ["https://verybadserver.error"]
-            sites_checker = SitesChecker(hosts = hosts, count = 1)
-            await sites_checker.start()
-            info = sites_checker.results[0]
-            self.assertEqual(info["host"], hosts[0])
-            self.assertEqual(info["success"], 0)
-            self.assertEqual(info["errors"], 1)
-            self.assertEqual(info["failed"], 0)
-
-    @patch("aiohttp.ClientSession.get")
-    async def test_server_failed(self, mock_get):
-        """Test server failed responses (4xx or 5xx status codes)."""
-        hosts = ["https://workingbadserver.fails"]
-        for status in (404, 500, 502):
-            mock_get.return_value = self.__class__.create_mock_get(status)
-            sites_checker = SitesChecker(hosts = hosts, count = 3)
-            await sites_checker.start()
-            info = sites_checker.results[0]
-            self.assertEqual(info["host"], hosts[0])
-            self.assertEqual(info["success"], 0)
-            self.assertEqual(info["errors"], 0)
-            self.assertEqual(info["failed"], 3)
-
-    @patch("aiohttp.ClientSession.get")
-    @patch("sys.stdout", new_callable=io.StringIO)
-    async def test_print(self, mock_stdout, mock_get):
-        """Test printing the results table to the console."""
-        mock_get.return_value = self.__class__.create_mock_get(200)
-        hosts = ["https://example.com"]
-        sites_checker = SitesChecker(hosts = hosts, count = 2)
+        errors = (aiohttp.ClientError, aiohttp.ServerTimeoutError, aiohttp.ServerDisconnectedError)
+        # one host per error, so a single run covers all of them
+        mocks = {f"https://verybadserver_{i}.error": create_mock_get(500, raises = e)
+                 for i, e in enumerate(errors)}
+        self.mock_get.side_effect = lambda host, *args, **kwargs: mocks[host]
+        sites_checker = SitesChecker(hosts = list(mocks), count = 1)
         await sites_checker.start()
-        sites_checker.print_table()
-        output = mock_stdout.getvalue()
-        self.assertIn(hosts[0], output)
-        self.assertIn("2", output)
-        self.assertIn("0", output)
+        self.assertEqual(len(sites_checker.results), len(mocks))
+        for e, host, info in zip(errors, mocks, sites_checker.results):
+            with self.subTest(error = e.__name__):
+                self.assertEqual(info["host"], host)
+                self.assertEqual(info["success"], 0)
+                self.assertEqual(info["errors"], 1)
+                self.assertEqual(info["failed"], 0)
 
-    @patch("aiohttp.ClientSession.get")
-    async def test_file_output(self, mock_get):
-        """Test writing the results table to a file."""
-        mock_get.return_value = self.__class__.create_mock_get(200)
-        hosts = ["https://example.com"]
-        sites_checker = SitesChecker(hosts = hosts, count = 2, output_file = str(self.output_file))
+    async def test_server_failed(self):
+        """Test server failed responses (4xx or 5xx status codes)."""
+        statuses = (404, 500, 502)
+        # one host per status, so a single run covers all of them
+        mocks = {f"https://workingbadserver_{status}.fails": create_mock_get(status)
+                 for status in statuses}
+        self.mock_get.side_effect = lambda host, *args, **kwargs: mocks[host]
+        sites_checker = SitesChecker(hosts = list(mocks), count = 3)
         await sites_checker.start()
-        sites_checker.print_table()
-        with open(self.output_file, encoding = "utf-8") as file:
-            output = file.read()
-        self.assertIn(hosts[0], output)
-        self.assertIn("2", output)
-        self.assertIn("0", output)
+        self.assertEqual(len(sites_checker.results), len(mocks))
+        for status, host, info in zip(statuses, mocks, sites_checker.results):
+            with self.subTest(status = status):
+                self.assertEqual(info["host"], host)
+                self.assertEqual(info["success"], 0)
+                self.assertEqual(info["errors"], 0)
+                self.assertEqual(info["failed"], 3)
 
-    @patch("aiohttp.ClientSession.get")
-    @patch("sys.stdout", new_callable=io.StringIO)
-    async def test_empty_results(self, mock_stdout, mock_get):
+    def test_empty_results(self):
         """Test empty results handling."""
         # This is impossible situation, because there's check for the hosts in args_parser
-        mock_get.return_value = self.__class__.create_mock_get(200)
-        hosts = []
-        sites_checker = SitesChecker(hosts = hosts, count = 1)
-        await sites_checker.start()
-        sites_checker.print_table()
-        output = mock_stdout.getvalue().strip()
+        sites_checker = SitesChecker(hosts = [], count = 1)
+        sites_checker.results = []
+        stream = io.StringIO()
+        sites_checker.print_table(stream = stream)
+        output = stream.getvalue().strip()
         self.assertEqual(output, "")
 
-    @patch("aiohttp.ClientSession.get")
-    @patch("sys.stdout", new_callable = io.StringIO)
-    async def test_error_site(self, mock_stdout, mock_get):
+    async def test_error_site(self):
         """Test printing error sites table."""
-        mock_get.return_value = self.__class__.create_mock_get(200, raises = aiohttp.ClientError)
+        self.mock_get.return_value = create_mock_get(200, raises = aiohttp.ClientError)
         hosts = ["https://bad_site.com"]
         sites_checker = SitesChecker(hosts = hosts, count = 1)
         await sites_checker.start()
-        sites_checker.print_table()
-        output = mock_stdout.getvalue().strip()
+        stream = io.StringIO()
+        sites_checker.print_table(stream = stream)
+        output = stream.getvalue().strip()
         self.assertNotIn("None", output)
         self.assertNotIn("inf", output)
         self.assertIn("1", output)
         self.assertIn("0", output)
 
-    @patch("aiohttp.ClientSession.get")
-    async def test_asyncio(self, mock_get):
+    async def test_asyncio(self):
         """Test for asynchronous behavior."""
-        mock_get.return_value = self.__class__.create_mock_get(200, 1)
+        request = InFlightRequestContext(FakeResponse(200))
+        self.mock_get.return_value = request
         hosts = [f"https://example_{i}.com/" for i in range(1, 10)]
         sites_checker = SitesChecker(hosts = hosts, count = 5)
-        start = asyncio.get_event_loop().time()
         await sites_checker.start()
-        all_time = asyncio.get_event_loop().time() - start
-        # 10 sites with 1-second delays and 5 counts
-        # if program isn't async, it'll be 50 seconds
-        self.assertLess(all_time, 5)
-
-    @patch("aiohttp.ClientSession.get")
-    @patch("sys.stdout", new_callable=io.StringIO)
-    @patch("sys.argv", ["bench.py", "-H", "https://example.com"])
-    async def test_working_from_console(self, mock_stdout, mock_get):
+        # all requests to all hosts must be in flight at once
+        self.assertEqual(request.max_in_flight, len(hosts) * sites_checker.count)
+        self.assertEqual(request.in_flight, 0)
+
+    async def test_response_times(self):
+        """Test min, max and avg over successful, failed and errored requests."""
+        clock = FakeClock()
+        self.mock_get.side_effect = [
+            TimedRequestContext(FakeResponse(200), clock, 0.1),
+            TimedRequestContext(FakeResponse(404), clock, 0.25),
+            TimedRequestContext(FakeResponse(200), clock, 0.4),
+            create_mock_get(200, raises = aiohttp.ClientError),
+        ]
+        sites_checker = SitesChecker(hosts = ["https://example.com"], count = 4)
+        with patch.object(bench, "perf_counter", clock):
+            await sites_checker.start()
+        info = sites_checker.results[0]
+        self.assertEqual((info["success"], info["failed"], info["errors"]), (2, 1, 1))
+        # failed responses count too, errors don't
+        self.assertEqual(info["min"], 0.1)
+        self.assertEqual(info["max"], 0.4)
+        self.assertEqual(info["avg"], 0.25)
+
+    @patch.object(bench, "MAX_CONCURRENT_REQUESTS", 4)
+    async def test_concurrency_limit(self):
+        """Test that no more than MAX_CONCURRENT_REQUESTS requests are in flight."""
+        request = InFlightRequestContext(FakeResponse(200))
+        self.mock_get.return_value = request
+        hosts = [f"https://example_{i}.com/" for i in range(1, 4)]
+        sites_checker = SitesChecker(hosts = hosts, count = 5)
+        await sites_checker.start()
+        self.assertEqual(request.max_in_flight, 4)
+        self.assertEqual(request.in_flight, 0)
+        self.assertEqual([info["success"] for info in sites_checker.results], [5] * len(hosts))
+
+    @patch.object(bench, "MAX_CONCURRENT_REQUESTS", 1)
+    async def test_unexpected_error(self):
+        """Test that errors other than ClientError propagate and free their slots."""
+        self.mock_get.return_value = create_mock_get(200, raises = ValueError)
+        sites_checker = SitesChecker(hosts = ["https://example.com"], count = 3)
+        # if a failed request kept its slot, the next one would wait forever
+        with self.assertRaises(ValueError):
+            await asyncio.wait_for(sites_checker.start(), 5)
+
+    @patch.object(sys, "stdout", new_callable=io.StringIO)
+    @patch.object(sys, "argv", ["bench.py", "-H", "https://example.com"])
+    async def test_working_from_console(self, mock_stdout):
         """Test working from console."""
-        mock_get.return_value = self.__class__.create_mock_get(200)
+        self.mock_get.return_value = create_mock_get(200)
         await main()
         output = mock_stdout.getvalue().strip()
         self.assertIn("example.com", output)
         self.assertIn("1", output)
         self.assertIn("0", output)
+
+
+class SuccessfulRunTestCase(unittest.TestCase):
+    """Tests sharing one successful run of site_checker."""
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Run SitesChecker once against a working host and keep it for all tests."""
+        super().setUpClass()
+        temp_dir = tempfile.TemporaryDirectory(prefix = f"{cls.__name__}_")
+        cls.addClassCleanup(temp_dir.cleanup)
+        cls.temp_dir = pathlib.Path(temp_dir.name)
+        cls.output_file = cls.temp_dir / "output.txt"
+        cls.hosts = ["https://example.com"]
+        cls.sites_checker = SitesChecker(hosts = cls.hosts, count = 2,
+                                         output_file = str(cls.output_file))
+        with patch.object(aiohttp.ClientSession, "get", return_value = create_mock_get(200)):
+            asyncio.run(cls.sites_checker.start())
+
+    def test_just_works(self):
+        """Test successful GET request."""
+        info = self.sites_checker.results[0]
+        self.assertEqual(info["host"], self.hosts[0])
+        self.assertEqual(info["success"], 2)
+        self.assertEqual(info["errors"], 0)
+        self.assertEqual(info["failed"], 0)
+
+    def test_print(self):
+        """Test printing the results table to a stream."""
+        stream = io.StringIO()
+        self.sites_checker.print_table(stream = stream)
+        output = stream.getvalue()
+        self.assertIn(self.hosts[0], output)
+        self.assertIn("2", output)
+        self.assertIn("0", output)
+
+    def test_file_output(self):
+        """Test writing the results table to a file."""
+        self.sites_checker.print_table()
+        output = self.output_file.read_text(encoding = "utf-8")
+        stream = io.StringIO()
+        self.sites_checker.print_table(stream = stream)
+        self.assertEqual(output, stream.getvalue())
+        self.assertIn(self.hosts[0], output)
+        self.assertIn("2", output)
+        self.assertIn("0", output)